@@ -5,8 +5,10 @@ Pytest configuration and shared fixtures for PostWriter tests
 
 import os
 import sys
+import shutil
 import tempfile
 import pytest
+from pathlib import Path
 import asyncio
 from unittest.mock import MagicMock, patch
 
@@ -52,6 +54,19 @@ def event_loop():
     loop.close()
 
 
+@pytest.fixture(scope="session")
+def ram_tmp(tmp_path_factory):
+    """Session-wide scratch root on a RAM-backed mount when one is available"""
+    shm = Path("/dev/shm")
+    if shm.is_dir() and os.access(shm, os.W_OK):
+        root = shm / f"pw-{os.getpid()}"
+    else:
+        root = tmp_path_factory.mktemp("pw")
+    root.mkdir(exist_ok=True)
+    yield root
+    shutil.rmtree(root, ignore_errors=True)
+
+
 @pytest.fixture
 def temp_dir():
     """Create a temporary directory for test files"""
@@ -299,9 +299,9 @@ class SecureBrowserStorage:
 class ChromeSessionManager:
     """Manages Chrome debugging session with secure storage"""
     
-    def __init__(self, debug_port: int = 9222):
+    def __init__(self, debug_port: int = 9222, browser_storage: Optional[SecureBrowserStorage] = None):
         self.debug_port = debug_port
-        self.browser_storage = SecureBrowserStorage("chrome_sessions")
+        self.browser_storage = browser_storage or SecureBrowserStorage("chrome_sessions")
     
     def extract_and_encrypt_session(self, session_name: str = "default", password: str = None) -> bool:
         """
@@ -7,14 +7,29 @@ Provides security-aware logging that filters sensitive information
 import os
 import re
 import json
+import queue
+import atexit
+import weakref
 import logging
+import logging.handlers
 import hashlib
-from typing import Any, Dict, List, Union, Optional
+import threading
+from typing import Any, Dict, List, Tuple, Union, Optional
 from datetime import datetime
 from dataclasses import dataclass
 
 from exceptions import SecurityError
 
+try:
+    import hyperscan
+    HYPERSCAN_AVAILABLE = True
+except ImportError:
+    hyperscan = None
+    HYPERSCAN_AVAILABLE = False
+
+# Python's \s also matches these separators while Hyperscan's does not
+_HYPERSCAN_UNSAFE_CHARS = re.compile(r'[\x1c-\x1f]')
+
 
 @dataclass
 class SensitivePattern:
@@ -23,11 +38,22 @@ class SensitivePattern:
     replacement: str
     description: str
     severity: str  # 'high', 'medium', 'low'
+    # Casefolded substrings of which at least one must occur for the pattern
+    # to possibly match; empty means the pattern is always evaluated
+    sentinels: Tuple[str, ...] = ()
+    # True when every match contains one of '=', ':' or '@'
+    requires_separator: bool = False
 
 
 class SecurityLogFilter:
     """Filters sensitive information from log messages"""
     
+    # Lowercased JSON keys whose values are always redacted
+    SENSITIVE_KEYS = frozenset({
+        'password', 'token', 'api_key', 'secret', 'auth', 'auth_token', 'key',
+        'session_id', 'cookie', 'authorization'
+    })
+    
     def __init__(self):
         """Initialize security filter with predefined patterns"""
         self.sensitive_patterns = [
@@ -36,7 +62,9 @@ class SecurityLogFilter:
                 pattern=r'(?i)(token|auth|bearer|api[_-]?key)\s*[=:]\s*["\']?([a-zA-Z0-9_\-\.]{20,})["\']?',
                 replacement=r'\1=***TOKEN_REDACTED***',
                 description='Authentication tokens and API keys',
-                severity='high'
+                severity='high',
+                sentinels=('token', 'auth', 'bearer', 'api'),
+                requires_separator=True
             ),
             
             # Passwords
@@ -44,7 +72,9 @@ class SecurityLogFilter:
                 pattern=r'(?i)(password|passwd|pwd)\s*[=:]\s*["\']?([^"\'\s]{6,})["\']?',
                 replacement=r'\1=***PASSWORD_REDACTED***',
                 description='Password fields',
-                severity='high'
+                severity='high',
+                sentinels=('passw', 'pwd'),
+                requires_separator=True
             ),
             
             # Session IDs and cookies
@@ -52,7 +82,9 @@ class SecurityLogFilter:
                 pattern=r'(?i)(session[_-]?id|sid|sess)\s*[=:]\s*["\']?([a-zA-Z0-9_\-]{16,})["\']?',
                 replacement=r'\1=***SESSION_REDACTED***',
                 description='Session identifiers',
-                severity='high'
+                severity='high',
+                sentinels=('sess', 'sid'),
+                requires_separator=True
             ),
             
             # Facebook cookies (specific patterns)
@@ -60,7 +92,9 @@ class SecurityLogFilter:
                 pattern=r'(?i)(sb|datr|c_user|xs|fr)\s*[=:]\s*["\']?([^"\'\s&;]{10,})["\']?',
                 replacement=r'\1=***FB_COOKIE_REDACTED***',
                 description='Facebook authentication cookies',
-                severity='high'
+                severity='high',
+                sentinels=('sb', 'datr', 'c_user', 'xs', 'fr'),
+                requires_separator=True
             ),
             
             # Generic cookie values
@@ -68,7 +102,9 @@ class SecurityLogFilter:
                 pattern=r'(?i)cookie[s]?\s*[=:]\s*["\']?([^"\'\s]{20,})["\']?',
                 replacement='cookies=***COOKIES_REDACTED***',
                 description='Generic cookie values',
-                severity='medium'
+                severity='medium',
+                sentinels=('cookie',),
+                requires_separator=True
             ),
             
             # URLs with sensitive parameters
@@ -76,7 +112,9 @@ class SecurityLogFilter:
                 pattern=r'(https?://[^?\s]+\?)([^"\s]+)',
                 replacement=r'\1***PARAMS_REDACTED***',
                 description='URL parameters that may contain sensitive data',
-                severity='medium'
+                severity='medium',
+                sentinels=('://',),
+                requires_separator=True
             ),
             
             # Email addresses
@@ -84,7 +122,9 @@ class SecurityLogFilter:
                 pattern=r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
                 replacement='***EMAIL_REDACTED***',
                 description='Email addresses',
-                severity='low'
+                severity='low',
+                sentinels=('@',),
+                requires_separator=True
             ),
             
             # Credit card numbers (basic pattern)
@@ -108,7 +148,9 @@ class SecurityLogFilter:
                 pattern=r'(?i)(["\'](?:token|password|auth|key|secret|cookie)["\'])\s*:\s*["\']([^"\']{6,})["\']',
                 replacement=r'\1: "***REDACTED***"',
                 description='JSON sensitive key-value pairs',
-                severity='high'
+                severity='high',
+                sentinels=('token', 'password', 'auth', 'key', 'secret', 'cookie'),
+                requires_separator=True
             )
         ]
         
@@ -117,8 +159,18 @@ class SecurityLogFilter:
             (re.compile(pattern.pattern), pattern.replacement, pattern)
             for pattern in self.sensitive_patterns
         ]
+        
+        # The same clean messages get logged over and over, so remember the
+        # ones that needed no redaction. Messages that did contain sensitive
+        # data are never cached, to keep secrets out of long-lived memory.
+        self._clean_messages = set()
+        self._clean_cache_size = 8192
+        
+        # Optional Hyperscan database that rejects clean messages in one pass
+        self._prefilter_db = self._build_prefilter()
+        self._prefilter_scratch = threading.local()
     
-    def filter_message(self, message: str) -> tuple[str, List[str]]:
+    def filter_message(self, message: str) -> Tuple[str, Tuple[str, ...]]:
         """
         Filter sensitive information from a log message
         
@@ -126,18 +178,120 @@ class SecurityLogFilter:
             message: Original log message
             
         Returns:
-            tuple: (filtered_message, list_of_detected_patterns)
+            tuple: (filtered_message, tuple_of_detected_patterns)
+        """
+        return self._filter_with(message, self.compiled_patterns)
+    
+    def filter_many(self, messages: List[str]) -> List[Tuple[str, Tuple[str, ...]]]:
+        """
+        Filter sensitive information from a batch of log messages
+        
+        Args:
+            messages: Original log messages
+            
+        Returns:
+            list: (filtered_message, tuple_of_detected_patterns) per message
         """
+        # One keyword scan over the whole batch rules out patterns that
+        # cannot match any of the messages
+        batch = '\x00'.join(messages).casefold()
+        candidates = [
+            entry for entry in self.compiled_patterns
+            if not entry[2].sentinels or any(sentinel in batch for sentinel in entry[2].sentinels)
+        ]
+        return [self._filter_with(message, candidates) for message in messages]
+    
+    def _filter_with(self, message: str, compiled_patterns) -> Tuple[str, Tuple[str, ...]]:
+        """Apply the given compiled patterns to a single message"""
+        if message in self._clean_messages:
+            return message, ()
+        
+        # Structured payloads are redacted by key instead of by regex
+        if message.lstrip().startswith(('{', '[')):
+            redacted = self._try_json_redact(message, compiled_patterns)
+            if redacted is not None:
+                if not redacted[1]:
+                    self._remember_clean(message)
+                return redacted
+        
+        if self._prefilter_db is not None and self._prefilter_rejects(message):
+            return message, ()
+        
         filtered_message = message
         detected_patterns = []
         
-        for compiled_pattern, replacement, pattern_info in self.compiled_patterns:
-            matches = compiled_pattern.findall(filtered_message)
-            if matches:
-                filtered_message = compiled_pattern.sub(replacement, filtered_message)
+        # Most log lines contain none of the keywords, so a substring check
+        # lets us skip the regex scan for the majority of patterns
+        folded = message.casefold()
+        has_separator = '=' in message or ':' in message or '@' in message
+        
+        for compiled_pattern, replacement, pattern_info in compiled_patterns:
+            if pattern_info.requires_separator and not has_separator:
+                continue
+            sentinels = pattern_info.sentinels
+            if sentinels and not any(sentinel in folded for sentinel in sentinels):
+                continue
+            
+            filtered_message, replaced = compiled_pattern.subn(replacement, filtered_message)
+            if replaced:
                 detected_patterns.append(pattern_info.description)
+                folded = filtered_message.casefold()
+        
+        if not detected_patterns:
+            self._remember_clean(message)
+        
+        return filtered_message, tuple(detected_patterns)
+    
+    def _remember_clean(self, message: str):
+        """Record a message that needed no redaction"""
+        if len(self._clean_messages) >= self._clean_cache_size:
+            self._clean_messages.clear()
+        self._clean_messages.add(message)
+    
+    def _try_json_redact(self, message: str, compiled_patterns) -> Optional[Tuple[str, Tuple[str, ...]]]:
+        """Redact a JSON payload structurally, or return None if it is not JSON"""
+        try:
+            payload = json.loads(message)
+        except (ValueError, RecursionError):
+            return None
+        
+        detected_patterns = []
+        try:
+            redacted = self._redact_json_value(payload, compiled_patterns, detected_patterns)
+            if not detected_patterns:
+                return message, ()
+            return json.dumps(redacted, ensure_ascii=False), tuple(detected_patterns)
+        except RecursionError:
+            # Too deeply nested to walk; the plain regex pass still applies
+            return None
+    
+    def _redact_json_value(self, value: Any, compiled_patterns, detected_patterns: List[str]) -> Any:
+        """Recursively redact sensitive keys and string values in decoded JSON"""
+        if isinstance(value, dict):
+            redacted = {}
+            for key, item in value.items():
+                if key.lower() in self.SENSITIVE_KEYS and not isinstance(item, (dict, list)):
+                    redacted[key] = '***REDACTED***'
+                    if 'JSON sensitive key-value pairs' not in detected_patterns:
+                        detected_patterns.append('JSON sensitive key-value pairs')
+                else:
+                    redacted[key] = self._redact_json_value(item, compiled_patterns, detected_patterns)
+            return redacted
+        
+        if isinstance(value, list):
+            return [self._redact_json_value(item, compiled_patterns, detected_patterns) for item in value]
+        
+        # Numbers can carry card or phone digits just like strings can
+        if isinstance(value, str) or (isinstance(value, (int, float)) and not isinstance(value, bool)):
+            filtered, detected = self._filter_with(str(value), compiled_patterns)
+            if not detected:
+                return value
+            for description in detected:
+                if description not in detected_patterns:
+                    detected_patterns.append(description)
+            return filtered
         
-        return filtered_message, detected_patterns
+        return value
     
     def add_custom_pattern(self, pattern: SensitivePattern):
         """Add a custom sensitive data pattern"""
@@ -147,12 +301,128 @@ class SecurityLogFilter:
             pattern.replacement,
             pattern
         ))
+        self.clear_cache()
+        self._prefilter_db = self._build_prefilter()
+        self._prefilter_scratch = threading.local()
+    
+    def clear_cache(self):
+        """Forget which messages were previously found clean"""
+        self._clean_messages.clear()
+    
+    def _build_prefilter(self):
+        """Compile all patterns into one Hyperscan database, or None if unavailable"""
+        if not HYPERSCAN_AVAILABLE:
+            return None
+        
+        # Caseless prefilter mode only ever widens what matches, so a miss
+        # proves none of the re patterns can match either
+        expressions = [p.pattern.replace('(?i)', '', 1).encode() for p in self.sensitive_patterns]
+        flags = hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_PREFILTER | hyperscan.HS_FLAG_SINGLEMATCH
+        database = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+        try:
+            database.compile(
+                expressions=expressions,
+                ids=list(range(len(expressions))),
+                elements=len(expressions),
+                flags=[flags] * len(expressions)
+            )
+        except hyperscan.error:
+            return None
+        return database
+    
+    def _prefilter_rejects(self, message: str) -> bool:
+        """True when Hyperscan proves no pattern can match the message"""
+        # Byte-level matching only agrees with re on plain ASCII text
+        if not message.isascii() or _HYPERSCAN_UNSAFE_CHARS.search(message):
+            return False
+        
+        scratch = getattr(self._prefilter_scratch, 'scratch', None)
+        if scratch is None:
+            scratch = self._prefilter_scratch.scratch = hyperscan.Scratch(self._prefilter_db)
+        
+        try:
+            self._prefilter_db.scan(
+                message.encode('ascii'),
+                match_event_handler=_stop_on_first_match,
+                scratch=scratch
+            )
+        except hyperscan.ScanTerminated:
+            return False
+        return True
+
+
+def _stop_on_first_match(pattern_id, start, end, flags, context):
+    """Hyperscan callback that halts the scan at the first match"""
+    return True
+
+
+class _CountingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Size-rotating file handler that tracks the file size in memory"""
+    
+    def __init__(self, filename: str, max_bytes: int, backup_count: int):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count)
+        self._size = os.path.getsize(self.baseFilename) if os.path.exists(self.baseFilename) else 0
+    
+    def emit(self, record):
+        # Counting characters written avoids formatting each record twice and
+        # seeking the stream on every emit, as the stock shouldRollover does
+        try:
+            msg = self.format(record) + self.terminator
+            if self._size and self._size + len(msg) >= self.maxBytes:
+                self.doRollover()
+                self._size = 0
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(msg)
+            self.flush()
+            self._size += len(msg)
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+class _AncestorHandler(logging.Handler):
+    """Hands filtered records on to the handlers of a logger's ancestors"""
+    
+    def __init__(self, logger: logging.Logger):
+        super().__init__()
+        self._logger = logger
+    
+    def emit(self, record):
+        # Mirrors Logger.callHandlers for the parent chain, which the secure
+        # logger opts out of so raw records never reach it
+        current = self._logger.parent
+        while current is not None:
+            for handler in current.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+            if not current.propagate:
+                break
+            current = current.parent
+
+
+class _SafeQueueListener(logging.handlers.QueueListener):
+    """Queue listener whose thread survives handler and filter errors"""
+    
+    def handle(self, record):
+        record = self.prepare(record)
+        for handler in self.handlers:
+            if self.respect_handler_level and record.levelno < handler.level:
+                continue
+            # An exception escaping here would end the listener thread, after
+            # which every record is dropped and flush() blocks forever
+            try:
+                handler.handle(record)
+            except Exception:
+                handler.handleError(record)
 
 
 class SecureLogger:
     """Security-aware logger for PostWriter"""
     
-    def __init__(self, name: str = "postwriter", log_file: str = None, level: int = logging.INFO):
+    def __init__(self, name: str = "postwriter", log_file: str = None, level: int = logging.INFO,
+                 max_file_size: int = None, backup_count: int = 5):
         """
         Initialize secure logger
         
@@ -160,6 +430,8 @@ class SecureLogger:
             name: Logger name
             log_file: Optional log file path
             level: Logging level
+            max_file_size: Rotate the log file once it reaches this many characters
+            backup_count: Number of rotated log files to keep
         """
         self.name = name
         self.filter = SecurityLogFilter()
@@ -170,26 +442,85 @@ class SecureLogger:
         if self.logger.handlers:
             self.logger.handlers.clear()
         
+        # Callers only enqueue records; filtering and I/O happen on the
+        # listener thread so redaction stays off the calling thread
+        self._queue = queue.Queue()
+        self.logger.addHandler(logging.handlers.QueueHandler(self._queue))
+        # QueueHandler only redacts its own copy of the record, so the raw
+        # original must not propagate; filtered records are passed to the
+        # ancestors' handlers from the listener instead
+        self.logger.propagate = False
+        
         # Console handler with security filtering
         console_handler = logging.StreamHandler()
         console_handler.setFormatter(self._create_formatter())
         console_handler.addFilter(self._create_log_filter())
-        self.logger.addHandler(console_handler)
+        handlers = [console_handler]
         
         # File handler if specified
         if log_file:
             try:
                 os.makedirs(os.path.dirname(log_file), exist_ok=True)
-                file_handler = logging.FileHandler(log_file)
+                if max_file_size:
+                    file_handler = _CountingRotatingFileHandler(log_file, max_file_size, backup_count)
+                else:
+                    file_handler = logging.FileHandler(log_file)
                 file_handler.setFormatter(self._create_detailed_formatter())
                 file_handler.addFilter(self._create_log_filter())
-                self.logger.addHandler(file_handler)
+                handlers.append(file_handler)
             except Exception as e:
                 self.logger.warning(f"Could not create file handler for {log_file}: {e}")
         
+        ancestor_handler = _AncestorHandler(self.logger)
+        ancestor_handler.addFilter(self._create_log_filter())
+        handlers.append(ancestor_handler)
+        
+        self._listener = _SafeQueueListener(
+            self._queue, *handlers, respect_handler_level=True
+        )
+        self._listener.start()
+        self._closed = False
+        self._handlers_lock = threading.Lock()
+        _live_loggers.add(self)
+        
         # Security incident logging
         self.security_incidents = []
     
+    def add_handler(self, handler: logging.Handler):
+        """Attach an extra handler that receives security-filtered records"""
+        handler.addFilter(self._create_log_filter())
+        # The listener thread reads the tuple once per record, so swapping in
+        # a new one is safe; the lock keeps concurrent swaps from losing one
+        with self._handlers_lock:
+            self._listener.handlers = self._listener.handlers + (handler,)
+    
+    def remove_handler(self, handler: logging.Handler):
+        """Detach a handler previously attached with add_handler"""
+        with self._handlers_lock:
+            self._listener.handlers = tuple(h for h in self._listener.handlers if h is not handler)
+    
+    def flush(self):
+        """Block until every queued record has been filtered and written"""
+        if not self._closed:
+            self._queue.join()
+        for handler in self._listener.handlers:
+            handler.flush()
+    
+    def close(self):
+        """Drain the queue and stop the background listener"""
+        if self._closed:
+            return
+        self._closed = True
+        self._listener.stop()
+        for handler in self._listener.handlers:
+            handler.close()
+    
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+    
     def _create_formatter(self) -> logging.Formatter:
         """Create console log formatter"""
         return logging.Formatter(
@@ -212,8 +543,12 @@ class SecureLogger:
                 self.security_filter = security_filter
             
             def filter(self, record):
-                # Apply security filtering to the message
-                filtered_msg, detected = self.security_filter.filter_message(record.getMessage())
+                # Apply security filtering to the message; if that fails, drop
+                # the text rather than risk writing it out unredacted
+                try:
+                    filtered_msg, detected = self.security_filter.filter_message(record.getMessage())
+                except Exception:
+                    filtered_msg, detected = '***LOG_FILTER_FAILED***', ()
                 
                 # Replace the message with filtered version
                 record.msg = filtered_msg
@@ -245,6 +580,10 @@ class SecureLogger:
             details: Optional operation details
             level: Log level
         """
+        # Redacting details is wasted work if the record would be dropped
+        if not self.logger.isEnabledFor(level):
+            return
+        
         if details:
             # Filter details dictionary
             safe_details = self._filter_dict(details)
@@ -284,6 +623,9 @@ class SecureLogger:
             count: Number of items processed
             details: Additional details
         """
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+        
         message_parts = [f"DATA_OP: {operation}"]
         
         if count is not None:
@@ -303,6 +645,7 @@ class SecureLogger:
             return data
         
         filtered = {}
+        pending = []
         for key, value in data.items():
             # Check if key indicates sensitive data
             key_lower = key.lower()
@@ -318,29 +661,41 @@ class SecureLogger:
                 if len(value) > 5:
                     filtered[key].append(f"... and {len(value) - 5} more items")
             elif isinstance(value, str):
-                # Apply string filtering
-                filtered_str, _ = self.filter.filter_message(value)
-                filtered[key] = filtered_str
+                # Plain strings are filtered together as one batch below
+                filtered[key] = value
+                pending.append(key)
             else:
                 filtered[key] = value
         
+        if pending:
+            results = self.filter.filter_many([filtered[key] for key in pending])
+            for key, (filtered_str, _) in zip(pending, results):
+                filtered[key] = filtered_str
+        
         return filtered
     
+    def _redact_extra(self, level: int, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Redact structured extra fields by key before they reach the record"""
+        extra = kwargs.get('extra')
+        if extra and self.logger.isEnabledFor(level):
+            kwargs['extra'] = self._filter_dict(extra)
+        return kwargs
+    
     def info(self, message: str, *args, **kwargs):
         """Log info message with security filtering"""
-        self.logger.info(message, *args, **kwargs)
+        self.logger.info(message, *args, **self._redact_extra(logging.INFO, kwargs))
     
     def warning(self, message: str, *args, **kwargs):
         """Log warning message with security filtering"""
-        self.logger.warning(message, *args, **kwargs)
+        self.logger.warning(message, *args, **self._redact_extra(logging.WARNING, kwargs))
     
     def error(self, message: str, *args, **kwargs):
         """Log error message with security filtering"""
-        self.logger.error(message, *args, **kwargs)
+        self.logger.error(message, *args, **self._redact_extra(logging.ERROR, kwargs))
     
     def debug(self, message: str, *args, **kwargs):
         """Log debug message with security filtering"""
-        self.logger.debug(message, *args, **kwargs)
+        self.logger.debug(message, *args, **self._redact_extra(logging.DEBUG, kwargs))
     
     def get_security_incidents(self) -> List[Dict[str, Any]]:
         """Get list of detected security incidents"""
@@ -365,6 +720,16 @@ class SecureLogger:
             self.error(f"Failed to export security report: {e}")
 
 
+_live_loggers: "weakref.WeakSet[SecureLogger]" = weakref.WeakSet()
+
+
+@atexit.register
+def _close_live_loggers():
+    """Write out records still queued on every secure logger alive at exit"""
+    for logger in list(_live_loggers):
+        logger.close()
+
+
 # Global secure logger instance
 _global_logger = None
 
@@ -8,16 +8,49 @@ import time
 import random
 import json
 import os
-from typing import Dict, List, Optional, Tuple
+import sys
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
 from datetime import datetime, timedelta
 from dataclasses import dataclass, asdict
 from enum import Enum
 import threading
 import hashlib
+import atexit
+import weakref
+from collections import deque
+from functools import lru_cache
+from itertools import islice
 
 from secure_logging import get_secure_logger
 from exceptions import SecurityError
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+
+def _dump_state(state: Dict) -> bytes:
+    """Serialize persisted state, using orjson when it is installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(state, option=orjson.OPT_INDENT_2)
+    return json.dumps(state, indent=2).encode('utf-8')
+
+
+def _parse_state(data: bytes) -> Dict:
+    """Parse persisted state, using orjson when it is installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+@lru_cache(maxsize=4096)
+def _url_hash(url: str) -> str:
+    """Short hash used to log and persist URLs without exposing them"""
+    return hashlib.sha256(url.encode()).hexdigest()[:16]
+
 
 class RequestType(Enum):
     """Types of Facebook requests"""
@@ -74,7 +107,22 @@ class RateLimitConfig:
             ]
 
 
-@dataclass
+# Facebook-specific blocking phrases, matched against the lowercased body
+FACEBOOK_BLOCK_INDICATORS = (
+    "temporarily blocked from posting",
+    "we limit how often you can post",
+    "this feature isn't available right now",
+    "please verify your identity",
+    "unusual activity on your account"
+)
+
+
+# History can hold thousands of records, so drop the per-instance __dict__
+# where dataclasses support it (Python 3.10+)
+_RECORD_DATACLASS_OPTIONS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**_RECORD_DATACLASS_OPTIONS)
 class RequestRecord:
     """Record of a single request"""
     timestamp: datetime
@@ -131,15 +179,7 @@ class RateLimitDetector:
         
         # Check for Facebook-specific blocking indicators
         if response_text:
-            facebook_blocks = [
-                "temporarily blocked from posting",
-                "we limit how often you can post",
-                "this feature isn't available right now",
-                "please verify your identity",
-                "unusual activity on your account"
-            ]
-            
-            for block_indicator in facebook_blocks:
+            for block_indicator in FACEBOOK_BLOCK_INDICATORS:
                 if block_indicator in response_lower:
                     return True, f"Facebook blocking indicator: {block_indicator}"
         
@@ -159,8 +199,10 @@ class RateLimitDetector:
             return False, "No requests to analyze"
         
         now = datetime.now()
-        last_minute = [r for r in recent_requests if (now - r.timestamp).total_seconds() < 60]
-        last_hour = [r for r in recent_requests if (now - r.timestamp).total_seconds() < 3600]
+        minute_cutoff = now - timedelta(seconds=60)
+        hour_cutoff = now - timedelta(seconds=3600)
+        last_minute = [r for r in recent_requests if r.timestamp > minute_cutoff]
+        last_hour = [r for r in recent_requests if r.timestamp > hour_cutoff]
         
         # Check burst limits
         if len(last_minute) > self.config.max_requests_per_minute:
@@ -185,27 +227,47 @@ class RateLimitDetector:
 class IntelligentRateLimiter:
     """Intelligent rate limiter for Facebook scraping"""
     
-    def __init__(self, config: RateLimitConfig = None, storage_file: str = None):
+    def __init__(self, config: RateLimitConfig = None, storage_file: str = None,
+                 max_history_size: Optional[int] = None):
         """
         Initialize rate limiter
         
         Args:
             config: Rate limiting configuration
             storage_file: File to persist rate limiting data
+            max_history_size: Most request records kept in memory; the oldest
+                are evicted first. Defaults to twice the hourly limit, at least 2000.
         """
         self.config = config or RateLimitConfig()
         self.detector = RateLimitDetector(self.config)
         self.logger = get_secure_logger("rate_limiter")
         
-        # Request tracking
-        self.request_history: List[RequestRecord] = []
+        # Request tracking. Records are appended in time order, so old ones
+        # are always at the left end; maxlen bounds memory under bursts.
+        if max_history_size is None:
+            max_history_size = max(self.config.max_requests_per_hour * 2, 2000)
+        elif max_history_size < 1:
+            raise ValueError("max_history_size must be positive")
+        self.max_history = max_history_size
+        self.request_history: Deque[RequestRecord] = deque(maxlen=self.max_history)
         self.last_request_time: Optional[datetime] = None
+        # Monotonic twin of last_request_time for pacing within this process,
+        # so wall-clock adjustments cannot shorten a delay
+        self._last_request_monotonic: Optional[float] = None
         self.current_backoff: float = 0.0
         self.consecutive_failures: int = 0
         
         # Storage
         self.storage_file = storage_file or os.path.expanduser("~/.postwriter_rate_limits")
         self.lock = threading.Lock()
+        self._pacing_lock = threading.Lock()
+        
+        # State is written in batches rather than on every request
+        self.save_interval = 5.0
+        self.save_batch_size = 64
+        self._unsaved_requests = 0
+        self._last_save = time.monotonic()
+        _live_limiters.add(self)
         
         # Load persistent state
         self._load_state()
@@ -221,19 +283,26 @@ class IntelligentRateLimiter:
         Returns:
             float: Actual wait time in seconds
         """
-        with self.lock:
-            now = datetime.now()
-            
-            # Calculate base delay
-            base_delay = self._calculate_base_delay(request_type)
-            
-            # Check if we need backoff
-            backoff_delay = self._calculate_backoff_delay()
-            
-            # Calculate minimum time since last request
-            time_since_last = 0.0
-            if self.last_request_time:
-                time_since_last = (now - self.last_request_time).total_seconds()
+        # Requests still go out one at a time, but the sleep only holds the
+        # pacing lock so record_request is never stuck behind a waiter
+        with self._pacing_lock:
+            with self.lock:
+                now = datetime.now()
+                
+                # Calculate base delay
+                base_delay = self._calculate_base_delay(request_type)
+                
+                # Check if we need backoff
+                backoff_delay = self._calculate_backoff_delay()
+                consecutive_failures = self.consecutive_failures
+                
+                # Calculate minimum time since last request
+                time_since_last = 0.0
+                if self._last_request_monotonic is not None:
+                    time_since_last = time.monotonic() - self._last_request_monotonic
+                elif self.last_request_time:
+                    # Only known from persisted state of an earlier run
+                    time_since_last = (now - self.last_request_time).total_seconds()
             
             # Determine total wait time needed
             min_delay = max(base_delay, backoff_delay)
@@ -248,12 +317,12 @@ class IntelligentRateLimiter:
                 operation="rate_limit_wait",
                 data_type=f"{request_type.value}_request",
                 details={
-                    "url_hash": hashlib.sha256(url.encode()).hexdigest()[:16] if url else None,
+                    "url_hash": _url_hash(url) if url else None,
                     "base_delay": base_delay,
                     "backoff_delay": backoff_delay,
                     "time_since_last": time_since_last,
                     "final_wait_time": wait_time,
-                    "consecutive_failures": self.consecutive_failures
+                    "consecutive_failures": consecutive_failures
                 }
             )
             
@@ -263,7 +332,9 @@ class IntelligentRateLimiter:
                 time.sleep(wait_time)
             
             # Update last request time
-            self.last_request_time = datetime.now()
+            with self.lock:
+                self.last_request_time = datetime.now()
+                self._last_request_monotonic = time.monotonic()
             
             return wait_time
     
@@ -285,88 +356,144 @@ class IntelligentRateLimiter:
             bool: True if request appears successful, False if rate limited
         """
         with self.lock:
-            now = datetime.now()
-            
-            # Detect rate limiting
-            is_rate_limited, rate_limit_reason = self.detector.analyze_response(
-                response_text, response_status or 0, response_time
-            )
-            
-            # Determine if request was successful
-            success = (response_status is not None and 
-                      200 <= response_status < 300 and 
-                      not is_rate_limited and 
-                      error_message is None)
-            
-            # Create request record
-            record = RequestRecord(
-                timestamp=now,
-                request_type=request_type,
-                url=url,
-                response_status=response_status,
-                response_time=response_time,
-                success=success,
-                rate_limited=is_rate_limited,
-                error_message=error_message
+            backoff_before = self.current_backoff
+            result = self._record_locked(
+                request_type, url, response_status, response_text,
+                response_time, error_message, datetime.now()
             )
             
-            # Add to history
-            self.request_history.append(record)
+            self._note_unsaved(1, force=self.current_backoff != backoff_before)
             
-            # Clean old history (keep last 24 hours)
-            cutoff = now - timedelta(hours=24)
-            self.request_history = [r for r in self.request_history if r.timestamp > cutoff]
+            return result
+    
+    def record_requests(self, records: Sequence[Tuple[RequestType, str, Optional[int], str, float]]) -> List[bool]:
+        """
+        Record a batch of requests under a single lock acquisition
+        
+        Args:
+            records: Sequence of (request_type, url, response_status, response_text, response_time)
             
-            # Update failure tracking
-            if success:
-                self.consecutive_failures = 0
-                self.current_backoff = 0.0
-            else:
-                self.consecutive_failures += 1
-                if is_rate_limited:
-                    self._increase_backoff()
+        Returns:
+            list: Per-request result, as returned by record_request
+        """
+        with self.lock:
+            backoff_before = self.current_backoff
+            now = datetime.now()
+            results = [
+                self._record_locked(request_type, url, response_status, response_text, response_time, None, now)
+                for request_type, url, response_status, response_text, response_time in records
+            ]
             
-            # Log the request
-            self.logger.log_data_operation(
-                operation="request_recorded",
-                data_type=f"{request_type.value}_request",
-                details={
-                    "success": success,
-                    "rate_limited": is_rate_limited,
-                    "rate_limit_reason": rate_limit_reason if is_rate_limited else None,
-                    "response_status": response_status,
-                    "response_time": response_time,
-                    "consecutive_failures": self.consecutive_failures,
-                    "url_hash": hashlib.sha256(url.encode()).hexdigest()[:16]
-                }
-            )
+            if results:
+                self._note_unsaved(len(results), force=self.current_backoff != backoff_before)
             
-            # Log security event for rate limiting
+            return results
+    
+    def flush(self):
+        """Write any unsaved rate limiter state to disk"""
+        with self.lock:
+            if self._unsaved_requests:
+                self._save_state()
+    
+    def _note_unsaved(self, count: int, force: bool = False):
+        """Count unsaved requests and save once a batch or interval is reached; caller must hold self.lock"""
+        self._unsaved_requests += count
+        # Backoff changes are saved right away so a crash cannot forget them
+        if (force or self._unsaved_requests >= self.save_batch_size
+                or time.monotonic() - self._last_save >= self.save_interval):
+            self._save_state()
+    
+    def _record_locked(self, request_type: RequestType, url: str, response_status: Optional[int],
+                       response_text: str, response_time: float, error_message: Optional[str],
+                       now: datetime) -> bool:
+        """Record a single request; caller must hold self.lock"""
+        # Detect rate limiting
+        is_rate_limited, rate_limit_reason = self.detector.analyze_response(
+            response_text, response_status or 0, response_time
+        )
+        
+        # Determine if request was successful
+        success = (response_status is not None and 
+                  200 <= response_status < 300 and 
+                  not is_rate_limited and 
+                  error_message is None)
+        
+        # Create request record
+        record = RequestRecord(
+            timestamp=now,
+            request_type=request_type,
+            url=url,
+            response_status=response_status,
+            response_time=response_time,
+            success=success,
+            rate_limited=is_rate_limited,
+            error_message=error_message
+        )
+        
+        # Add to history
+        self.request_history.append(record)
+        self._cleanup_old_requests(now)
+        
+        # Update failure tracking
+        if success:
+            self.consecutive_failures = 0
+            self._decay_backoff()
+        else:
+            self.consecutive_failures += 1
             if is_rate_limited:
-                self.logger.log_security_event("rate_limit_detected", {
-                    "reason": rate_limit_reason,
-                    "request_type": request_type.value,
-                    "consecutive_failures": self.consecutive_failures,
-                    "current_backoff": self.current_backoff
-                })
-            
-            # Check request patterns
-            should_slow_down, pattern_reason = self.detector.analyze_request_pattern(
-                self.request_history[-50:]  # Last 50 requests
-            )
-            
-            if should_slow_down:
-                self.logger.log_security_event("rate_pattern_warning", {
-                    "reason": pattern_reason,
-                    "total_requests": len(self.request_history),
-                    "recent_failures": self.consecutive_failures
-                })
                 self._increase_backoff()
-            
-            # Save state
-            self._save_state()
-            
-            return success and not is_rate_limited
+        
+        # Log the request
+        self.logger.log_data_operation(
+            operation="request_recorded",
+            data_type=f"{request_type.value}_request",
+            details={
+                "success": success,
+                "rate_limited": is_rate_limited,
+                "rate_limit_reason": rate_limit_reason if is_rate_limited else None,
+                "response_status": response_status,
+                "response_time": response_time,
+                "consecutive_failures": self.consecutive_failures,
+                "url_hash": _url_hash(url)
+            }
+        )
+        
+        # Log security event for rate limiting
+        if is_rate_limited:
+            self.logger.log_security_event("rate_limit_detected", {
+                "reason": rate_limit_reason,
+                "request_type": request_type.value,
+                "consecutive_failures": self.consecutive_failures,
+                "current_backoff": self.current_backoff
+            })
+        
+        # Check request patterns
+        should_slow_down, pattern_reason = self.detector.analyze_request_pattern(
+            self._recent_requests(50)
+        )
+        
+        if should_slow_down:
+            self.logger.log_security_event("rate_pattern_warning", {
+                "reason": pattern_reason,
+                "total_requests": len(self.request_history),
+                "recent_failures": self.consecutive_failures
+            })
+            self._increase_backoff()
+        
+        return success and not is_rate_limited
+    
+    def _cleanup_old_requests(self, now: Optional[datetime] = None):
+        """Drop history older than 24 hours from the left end of the deque"""
+        cutoff = (now or datetime.now()) - timedelta(hours=24)
+        history = self.request_history
+        while history and history[0].timestamp <= cutoff:
+            history.popleft()
+    
+    def _recent_requests(self, count: int) -> List[RequestRecord]:
+        """Return the last `count` requests in chronological order"""
+        recent = list(islice(reversed(self.request_history), count))
+        recent.reverse()
+        return recent
     
     def _calculate_base_delay(self, request_type: RequestType) -> float:
         """Calculate base delay for request type"""
@@ -388,20 +515,23 @@ class IntelligentRateLimiter:
     
     def _calculate_backoff_delay(self) -> float:
         """Calculate current backoff delay"""
-        if self.current_backoff <= 0:
-            return 0.0
-        
-        # Add some randomness to backoff to avoid thundering herd
-        variance = random.uniform(0.8, 1.2)
-        return self.current_backoff * variance
+        # The backoff is already jittered when it grows, and wait_for_request
+        # applies its own variance on top
+        return max(self.current_backoff, 0.0)
     
     def _increase_backoff(self):
-        """Increase backoff delay due to failures"""
+        """Increase backoff delay due to failures (decorrelated jitter)"""
         if self.current_backoff <= 0:
             self.current_backoff = self.config.initial_backoff
         else:
+            # Draw the next delay between the initial backoff and a multiple of
+            # the previous one so concurrent clients spread out rather than
+            # retrying in lockstep
             self.current_backoff = min(
-                self.current_backoff * self.config.backoff_multiplier,
+                random.uniform(
+                    self.config.initial_backoff,
+                    self.current_backoff * (self.config.backoff_multiplier + 1)
+                ),
                 self.config.max_backoff
             )
         
@@ -411,26 +541,50 @@ class IntelligentRateLimiter:
             "max_backoff": self.config.max_backoff
         })
     
+    def _decay_backoff(self):
+        """Step backoff down after a success instead of dropping it at once"""
+        if self.current_backoff <= 0:
+            return
+        
+        decayed = self.current_backoff / max(self.config.backoff_multiplier, 2.0)
+        self.current_backoff = decayed if decayed >= self.config.initial_backoff else 0.0
+    
     def get_statistics(self) -> Dict:
         """Get rate limiting statistics"""
         now = datetime.now()
-        last_hour = [r for r in self.request_history if (now - r.timestamp).total_seconds() < 3600]
-        last_minute = [r for r in self.request_history if (now - r.timestamp).total_seconds() < 60]
+        hour_cutoff = now - timedelta(seconds=3600)
+        minute_cutoff = now - timedelta(seconds=60)
         
-        successful_requests = [r for r in last_hour if r.success]
-        rate_limited_requests = [r for r in last_hour if r.rate_limited]
+        total_hour = 0
+        total_minute = 0
+        successful_hour = 0
+        rate_limited_hour = 0
+        request_types = {rt.value: 0 for rt in RequestType}
+        
+        # History is in time order, so walk back from the newest record and
+        # stop at the first one outside the hour window
+        for r in reversed(self.request_history):
+            if r.timestamp <= hour_cutoff:
+                break
+            total_hour += 1
+            if r.timestamp > minute_cutoff:
+                total_minute += 1
+            if r.success:
+                successful_hour += 1
+            if r.rate_limited:
+                rate_limited_hour += 1
+            request_types[r.request_type.value] += 1
         
         return {
-            "total_requests_hour": len(last_hour),
-            "total_requests_minute": len(last_minute),
-            "successful_requests_hour": len(successful_requests),
-            "rate_limited_requests_hour": len(rate_limited_requests),
-            "success_rate_hour": len(successful_requests) / max(len(last_hour), 1),
+            "total_requests_hour": total_hour,
+            "total_requests_minute": total_minute,
+            "successful_requests_hour": successful_hour,
+            "rate_limited_requests_hour": rate_limited_hour,
+            "success_rate_hour": successful_hour / max(total_hour, 1),
             "consecutive_failures": self.consecutive_failures,
             "current_backoff": self.current_backoff,
             "last_request_time": self.last_request_time.isoformat() if self.last_request_time else None,
-            "request_types": {rt.value: sum(1 for r in last_hour if r.request_type == rt) 
-                           for rt in RequestType}
+            "request_types": request_types
         }
     
     def reset_backoff(self):
@@ -456,18 +610,25 @@ class IntelligentRateLimiter:
                     {
                         "timestamp": r.timestamp.isoformat(),
                         "request_type": r.request_type.value,
-                        "url_hash": hashlib.sha256(r.url.encode()).hexdigest()[:16],
+                        "url_hash": _url_hash(r.url),
                         "response_status": r.response_status,
                         "response_time": r.response_time,
                         "success": r.success,
                         "rate_limited": r.rate_limited
                     }
-                    for r in self.request_history[-100:]  # Keep last 100 requests
+                    for r in self._recent_requests(100)  # Keep last 100 requests
                 ]
             }
             
-            with open(self.storage_file, 'w') as f:
-                json.dump(state, f, indent=2)
+            # Write to a temporary file first so a crash never leaves a
+            # truncated state file behind
+            temp_file = f"{self.storage_file}.tmp"
+            with open(temp_file, 'wb') as f:
+                f.write(_dump_state(state))
+            os.replace(temp_file, self.storage_file)
+            
+            self._unsaved_requests = 0
+            self._last_save = time.monotonic()
                 
         except Exception as e:
             self.logger.warning(f"Failed to save rate limiter state: {e}")
@@ -478,8 +639,8 @@ class IntelligentRateLimiter:
             if not os.path.exists(self.storage_file):
                 return
             
-            with open(self.storage_file, 'r') as f:
-                state = json.load(f)
+            with open(self.storage_file, 'rb') as f:
+                state = _parse_state(f.read())
             
             # Restore basic state
             if state.get("last_request_time"):
@@ -517,14 +678,28 @@ class IntelligentRateLimiter:
 
 # Global rate limiter instance
 _global_rate_limiter = None
+_global_rate_limiter_lock = threading.Lock()
+
+# Limiters whose unsaved state is flushed at interpreter exit
+_live_limiters: "weakref.WeakSet[IntelligentRateLimiter]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_live_limiters():
+    """Persist pending state of every rate limiter still alive at exit"""
+    for limiter in list(_live_limiters):
+        limiter.flush()
 
 
 def get_rate_limiter(config: RateLimitConfig = None) -> IntelligentRateLimiter:
     """Get or create global rate limiter instance"""
     global _global_rate_limiter
     
+    # Only the first calls pay for the lock; afterwards this is a plain read
     if _global_rate_limiter is None:
-        _global_rate_limiter = IntelligentRateLimiter(config)
+        with _global_rate_limiter_lock:
+            if _global_rate_limiter is None:
+                _global_rate_limiter = IntelligentRateLimiter(config)
     
     return _global_rate_limiter
 
@@ -5,11 +5,12 @@ Provides dual Playwright/Selenium control with real-time monitoring capabilities
 """
 
 import asyncio
+import importlib.util
 import time
 import json
 import os
 from datetime import datetime
-from typing import Dict, Optional, Union, List, Callable
+from typing import Dict, Optional, Union, List, Callable, TYPE_CHECKING
 from dataclasses import dataclass
 from enum import Enum
 
@@ -17,19 +18,33 @@ import requests
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options as ChromeOptions
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import WebDriverException, TimeoutException
 
-try:
-    from playwright.async_api import async_playwright, Browser, Page, BrowserContext
-    from playwright.sync_api import sync_playwright
-    PLAYWRIGHT_AVAILABLE = True
-except ImportError:
-    PLAYWRIGHT_AVAILABLE = False
-    Browser = None
-    Page = None
-    BrowserContext = None
+# Selenium's wait helpers drag in the whole remote WebDriver stack and
+# Playwright is optional, so both are imported on first use instead
+WebDriverWait = None
+EC = None
+async_playwright = None
+PLAYWRIGHT_AVAILABLE = importlib.util.find_spec("playwright") is not None
+
+if TYPE_CHECKING:
+    from playwright.async_api import Browser, Page, BrowserContext
+
+
+def _load_selenium_waits():
+    """Import Selenium's explicit-wait helpers unless already loaded or patched"""
+    global WebDriverWait, EC
+    if WebDriverWait is None:
+        from selenium.webdriver.support.ui import WebDriverWait
+    if EC is None:
+        from selenium.webdriver.support import expected_conditions as EC
+
+
+def _load_playwright():
+    """Import Playwright's async entry point unless already loaded or patched"""
+    global async_playwright
+    if async_playwright is None:
+        from playwright.async_api import async_playwright
 
 from ..security.logging import get_secure_logger
 from ..security.rate_limiter import get_rate_limiter, RequestType
@@ -88,9 +103,9 @@ class EnhancedBrowserManager:
         
         # Browser instances
         self.selenium_driver: Optional[webdriver.Chrome] = None
-        self.playwright_browser: Optional[Browser] = None
-        self.playwright_context: Optional[BrowserContext] = None
-        self.playwright_page: Optional[Page] = None
+        self.playwright_browser: Optional["Browser"] = None
+        self.playwright_context: Optional["BrowserContext"] = None
+        self.playwright_page: Optional["Page"] = None
         self.playwright = None
         
         # State tracking
@@ -111,6 +126,7 @@ class EnhancedBrowserManager:
         
         # Ensure screenshot directory exists
         os.makedirs(self.screenshot_dir, exist_ok=True)
+        self._screenshot_prefix = os.path.join(self.screenshot_dir, '')
         
         self.logger.info(f"Enhanced Browser Manager initialized with engine: {engine.value}")
 
@@ -193,6 +209,7 @@ class EnhancedBrowserManager:
         if not PLAYWRIGHT_AVAILABLE:
             raise ImportError("Playwright not available")
         
+        _load_playwright()
         self.playwright = await async_playwright().start()
         
         # Launch browser with similar settings to Selenium
@@ -356,7 +373,7 @@ class EnhancedBrowserManager:
                 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]
                 filename = f"screenshot_{timestamp}.png"
             
-            screenshot_path = os.path.join(self.screenshot_dir, filename)
+            screenshot_path = self._screenshot_prefix + filename
             
             if self.selenium_driver:
                 self.selenium_driver.save_screenshot(screenshot_path)
@@ -417,12 +434,22 @@ class EnhancedBrowserManager:
             self.logger.error(f"Scroll failed: {e}")
             return False
 
-    async def start_monitoring(self):
-        """Start real-time monitoring with periodic screenshots"""
+    async def start_monitoring(self, max_iterations: Optional[int] = None):
+        """Start real-time monitoring with periodic screenshots
+        
+        Args:
+            max_iterations: Stop after this many monitoring cycles (runs until stopped if None)
+        """
         self.monitoring_active = True
         self.logger.info("Started real-time monitoring")
         
+        iterations = 0
         while self.monitoring_active:
+            if max_iterations is not None and iterations >= max_iterations:
+                self.stop_monitoring()
+                break
+            iterations += 1
+            
             try:
                 # Take periodic screenshot
                 await self.take_screenshot()
@@ -450,24 +477,37 @@ class EnhancedBrowserManager:
         try:
             self.stop_monitoring()
             
+            # Both engines shut down concurrently; each engine's own steps stay ordered
+            shutdowns = []
             if self.selenium_driver:
-                self.selenium_driver.quit()
-                self.logger.info("Selenium driver closed")
+                shutdowns.append(self._close_selenium())
+            if self.playwright_context or self.playwright_browser or self.playwright:
+                shutdowns.append(self._close_playwright())
             
-            if self.playwright_context:
-                await self.playwright_context.close()
-            
-            if self.playwright_browser:
-                await self.playwright_browser.close()
-            
-            if self.playwright:
-                await self.playwright.stop()
+            await asyncio.gather(*shutdowns)
             
             self.logger.info("Browser cleanup complete")
             
         except Exception as e:
             self.logger.error(f"Cleanup error: {e}")
 
+    async def _close_selenium(self):
+        """Quit the Selenium driver without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.selenium_driver.quit)
+        self.logger.info("Selenium driver closed")
+
+    async def _close_playwright(self):
+        """Close the Playwright context and browser, then stop Playwright"""
+        if self.playwright_context:
+            await self.playwright_context.close()
+        
+        if self.playwright_browser:
+            await self.playwright_browser.close()
+        
+        if self.playwright:
+            await self.playwright.stop()
+
     def get_state(self) -> BrowserState:
         """Get current browser state"""
         return self.current_state
@@ -476,6 +516,7 @@ class EnhancedBrowserManager:
         """Wait for element to be present"""
         try:
             if self.selenium_driver:
+                _load_selenium_waits()
                 wait = WebDriverWait(self.selenium_driver, timeout)
                 wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
                 return True
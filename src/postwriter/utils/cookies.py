@@ -8,7 +8,9 @@ to eliminate duplication. Now supports secure encrypted cookie storage.
 
 import json
 import os
-from typing import Dict, Optional
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional
 
 # Import secure storage (optional for backward compatibility)
 try:
@@ -17,6 +19,57 @@ try:
 except ImportError:
     SECURE_STORAGE_AVAILABLE = False
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+
+def _loads(data: bytes):
+    """Parse a cookie file's contents, using orjson when it is installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _freeze(cookies_data):
+    """Make parsed cookie data safe to share: tuples of read-only mappings"""
+    if isinstance(cookies_data, dict):
+        return MappingProxyType(cookies_data)
+    if isinstance(cookies_data, list):
+        return tuple(
+            MappingProxyType(cookie) if isinstance(cookie, dict) else cookie
+            for cookie in cookies_data
+        )
+    return cookies_data
+
+
+@lru_cache(maxsize=8)
+def _parse_cookie_file(path: str, mtime_ns: int, ctime_ns: int, size: int):
+    """Parse a cookie file once per (path, mtime, ctime, size) version"""
+    # Cookie files are small; one unbuffered read skips the buffer copy
+    with open(path, 'rb', buffering=0) as f:
+        return _freeze(_loads(f.read()))
+
+
+def _load_cookies_raw(cookies_path: str):
+    """Return the parsed contents of a cookie file, re-reading it only when it changes
+    
+    The result is shared between callers, so lists come back as tuples and
+    objects as read-only mappings.
+    """
+    st = os.stat(cookies_path)
+    return _parse_cookie_file(
+        os.path.abspath(cookies_path), st.st_mtime_ns, st.st_ctime_ns, st.st_size
+    )
+
+
+def invalidate_cookie_cache() -> None:
+    """Drop all cached cookie files"""
+    _parse_cookie_file.cache_clear()
+
 
 def load_cookies_dict(cookies_path: str = './data/cookies.json', use_secure: bool = True, password: str = None) -> Dict[str, str]:
     """
@@ -45,18 +98,19 @@ def load_cookies_dict(cookies_path: str = './data/cookies.json', use_secure: boo
     # Fallback to regular file loading
     cookies_dict = {}
     try:
-        with open(cookies_path, 'r') as f:
-            cookies_data = json.load(f)
-            
-            # Handle different cookie formats
-            if isinstance(cookies_data, list):
-                # Array of cookie objects
-                for cookie in cookies_data:
-                    if isinstance(cookie, dict) and 'name' in cookie and 'value' in cookie:
-                        cookies_dict[cookie['name']] = cookie['value']
-            elif isinstance(cookies_data, dict):
-                # Direct name-value mapping
-                cookies_dict = cookies_data
+        cookies_data = _load_cookies_raw(cookies_path)
+        
+        # Handle different cookie formats
+        if isinstance(cookies_data, tuple):
+            # Array of cookie objects
+            cookies_dict = {
+                cookie['name']: cookie['value']
+                for cookie in cookies_data
+                if isinstance(cookie, Mapping) and 'name' in cookie and 'value' in cookie
+            }
+        elif isinstance(cookies_data, Mapping):
+            # Direct name-value mapping
+            cookies_dict = dict(cookies_data)
             
         print(f"📄 Loaded {len(cookies_dict)} cookies from regular file")
         return cookies_dict
@@ -82,17 +136,16 @@ def load_cookies_session(session, cookies_path: str) -> bool:
         True if cookies loaded successfully, False otherwise
     """
     try:
-        if os.path.exists(cookies_path):
-            with open(cookies_path, 'r') as f:
-                cookies_data = json.load(f)
-                for cookie in cookies_data:
-                    session.cookies.set(
-                        cookie['name'], 
-                        cookie['value'], 
-                        domain=cookie.get('domain', '.facebook.com')
-                    )
-            print("✅ Loaded cookies from file")
-            return True
+        for cookie in _load_cookies_raw(cookies_path):
+            session.cookies.set(
+                cookie['name'], 
+                cookie['value'], 
+                domain=cookie.get('domain', '.facebook.com')
+            )
+        print("✅ Loaded cookies from file")
+        return True
+    except FileNotFoundError:
+        pass
     except Exception as e:
         print(f"⚠️ Could not load cookies: {e}")
     return False
@@ -111,11 +164,11 @@ async def load_cookies_playwright(context, cookies_path: str) -> bool:
         True if cookies loaded successfully, False otherwise
     """
     try:
-        if os.path.exists(cookies_path):
-            with open(cookies_path, 'r') as f:
-                cookies = json.load(f)
-                await context.add_cookies(cookies)
-                return True
+        # Playwright gets its own mutable copies of the shared cookies
+        await context.add_cookies([dict(cookie) for cookie in _load_cookies_raw(cookies_path)])
+        return True
+    except FileNotFoundError:
+        pass
     except Exception as e:
         print(f"Error loading cookies: {e}")
     return False
\ No newline at end of file
@@ -5,7 +5,6 @@ Tests complete workflows, cross-component interactions, and real browser scenari
 """
 
 import os
-import tempfile
 import pytest
 import asyncio
 from unittest.mock import patch, MagicMock, AsyncMock
@@ -22,9 +21,10 @@ from src.postwriter.security.logging import get_secure_logger
 class TestBrowserUIIntegration:
     """Integration tests for browser manager and UI supervisor"""
     
-    def setup_method(self):
-        """Setup test environment"""
-        self.test_dir = tempfile.mkdtemp()
+    @pytest.fixture(autouse=True)
+    def setup_test_dir(self, tmp_path):
+        """Setup test environment; pytest prunes tmp_path itself"""
+        self.test_dir = str(tmp_path)
         self.config = {
             'testing': {
                 'screenshots_enabled': True,
@@ -40,11 +40,6 @@ class TestBrowserUIIntegration:
             }
         }
     
-    def teardown_method(self):
-        """Cleanup test environment"""
-        import shutil
-        shutil.rmtree(self.test_dir, ignore_errors=True)
-    
     @pytest.mark.asyncio
     async def test_browser_supervisor_lifecycle(self):
         """Test complete browser and supervisor lifecycle"""
@@ -172,9 +167,10 @@ class TestBrowserUIIntegration:
 class TestEndToEndWorkflows:
     """End-to-end workflow tests"""
     
-    def setup_method(self):
-        """Setup test environment"""
-        self.test_dir = tempfile.mkdtemp()
+    @pytest.fixture(autouse=True)
+    def setup_test_dir(self, tmp_path):
+        """Setup test environment; pytest prunes tmp_path itself"""
+        self.test_dir = str(tmp_path)
         self.config = {
             'testing': {
                 'screenshots_enabled': True,
@@ -191,11 +187,6 @@ class TestEndToEndWorkflows:
             }
         }
     
-    def teardown_method(self):
-        """Cleanup test environment"""
-        import shutil
-        shutil.rmtree(self.test_dir, ignore_errors=True)
-    
     @pytest.mark.asyncio
     async def test_facebook_login_workflow(self):
         """Test complete Facebook login workflow with monitoring"""
@@ -358,9 +349,10 @@ class TestEndToEndWorkflows:
 class TestComponentInteractions:
     """Test interactions between different components"""
     
-    def setup_method(self):
-        """Setup test environment"""
-        self.test_dir = tempfile.mkdtemp()
+    @pytest.fixture(autouse=True)
+    def setup_test_dir(self, tmp_path):
+        """Setup test environment; pytest prunes tmp_path itself"""
+        self.test_dir = str(tmp_path)
         self.config = {
             'testing': {
                 'screenshots_enabled': True,
@@ -371,11 +363,6 @@ class TestComponentInteractions:
             }
         }
     
-    def teardown_method(self):
-        """Cleanup test environment"""
-        import shutil
-        shutil.rmtree(self.test_dir, ignore_errors=True)
-    
     @pytest.mark.asyncio
     async def test_logging_integration(self):
         """Test secure logging integration with browser operations"""
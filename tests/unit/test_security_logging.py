@@ -7,12 +7,15 @@ Tests log filtering, security event tracking, and sensitive data protection
 import os
 import tempfile
 import json
+import logging
 import pytest
 from unittest.mock import patch, MagicMock
 import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
-from src.postwriter.security.logging import SecureLogger, get_secure_logger, SecurityLogFilter
+from src.postwriter.security.logging import (
+    SecureLogger, get_secure_logger, SecurityLogFilter, SensitivePattern, HYPERSCAN_AVAILABLE
+)
 
 
 class TestSecurityLogFilter:
@@ -133,6 +136,63 @@ class TestSecurityLogFilter:
             assert "456" in filtered
             assert "30" in filtered
     
+    def test_json_payload_redacted_by_key(self):
+        """Test that JSON messages are redacted structurally"""
+        message = '{"user": "admin", "nested": {"Token": "abc"}, "items": [{"secret": 1}], "count": 3}'
+        
+        filtered, detected = self.filter.filter_message(message)
+        
+        assert json.loads(filtered) == {
+            "user": "admin",
+            "nested": {"Token": "***REDACTED***"},
+            "items": [{"secret": "***REDACTED***"}],
+            "count": 3
+        }
+        assert detected == ("JSON sensitive key-value pairs",)
+        assert self.filter.filter_message('{"user": "admin"}') == ('{"user": "admin"}', ())
+    
+    def test_unicode_whitespace_separators(self):
+        """Test that non-ASCII whitespace around separators is still matched"""
+        for message in ("password\xa0=hunter2secret", "password = hunter2secret"):
+            filtered, detected = self.filter.filter_message(message)
+            assert "hunter2secret" not in filtered
+            assert "Password fields" in detected
+
+    def test_json_numeric_values_redacted(self):
+        """Test that numbers inside JSON go through the pattern pass"""
+        self.filter.add_custom_pattern(SensitivePattern(
+            pattern=r'\b\d{3}-?\d{2}-?\d{4}\b',
+            replacement='***SSN_REDACTED***',
+            description='Social security numbers',
+            severity='high'
+        ))
+
+        filtered, detected = self.filter.filter_message(
+            '{"credit_card": 4111111111111111, "ssn": 123456789, "phone": 5551234567, "count": 3}'
+        )
+
+        assert json.loads(filtered) == {
+            "credit_card": "***CARD_REDACTED***",
+            "ssn": "***SSN_REDACTED***",
+            "phone": "***PHONE_REDACTED***",
+            "count": 3
+        }
+        assert "Credit card numbers" in detected
+        assert "Social security numbers" in detected
+        assert "Phone numbers" in detected
+
+        filtered, _ = self.filter.filter_message('[4111111111111111]')
+        assert "4111111111111111" not in filtered
+
+    def test_deeply_nested_json_falls_back_to_regex(self):
+        """Test that JSON too deep to walk is still redacted"""
+        message = '[' * 900 + '"4111 1111 1111 1111"' + ']' * 900
+
+        filtered, detected = self.filter.filter_message(message)
+
+        assert "4111" not in filtered
+        assert "Credit card numbers" in detected
+
     def test_false_positives(self):
         """Test that normal content is not incorrectly filtered"""
         safe_messages = [
@@ -149,6 +209,85 @@ class TestSecurityLogFilter:
             filtered, _ = self.filter.filter_message(message)
             assert filtered == message  # Should be unchanged
     
+    def test_sentinel_prefilter_keeps_results(self):
+        """Test that skipping patterns by keyword gives the same output as a full scan"""
+        messages = [
+            "Contact ME@Example.com about PASSWORD: hunter22",
+            "Visit https://example.com/page?ref=abc and card 4111 1111 1111 1111",
+            "SESSION_ID=abcdef0123456789xyz",
+            "Nothing sensitive in this line"
+        ]
+        
+        for message in messages:
+            expected, expected_detected = message, []
+            for compiled_pattern, replacement, pattern_info in self.filter.compiled_patterns:
+                if compiled_pattern.findall(expected):
+                    expected = compiled_pattern.sub(replacement, expected)
+                    expected_detected.append(pattern_info.description)
+            
+            assert self.filter.filter_message(message) == (expected, tuple(expected_detected))
+    
+    def test_clean_message_cache_invalidated_by_custom_pattern(self):
+        """Test that cached clean messages are re-checked after adding a pattern"""
+        message = "internal ref ZX-9981 processed"
+        
+        assert self.filter.filter_message(message) == (message, ())
+        assert self.filter.filter_message(message) == (message, ())
+        
+        self.filter.add_custom_pattern(SensitivePattern(
+            pattern=r'ZX-\d+',
+            replacement='***REF_REDACTED***',
+            description='Internal references',
+            severity='low'
+        ))
+        
+        filtered, detected = self.filter.filter_message(message)
+        assert filtered == "internal ref ***REF_REDACTED*** processed"
+        assert detected == ('Internal references',)
+    
+    @pytest.mark.skipif(not HYPERSCAN_AVAILABLE, reason="hyperscan not installed")
+    def test_hyperscan_prefilter_only_rejects_clean_messages(self):
+        """Test that the Hyperscan prefilter never hides a message with sensitive data"""
+        assert self.filter._prefilter_rejects("Found 5 posts on page")
+        assert not self.filter._prefilter_rejects("password=secret123")
+        assert not self.filter._prefilter_rejects("mail me@example.com")
+        # Non-ASCII text always takes the regex path
+        assert not self.filter._prefilter_rejects("caf\u00e9 opened")
+    
+    def test_filter_many_matches_filter_message(self):
+        """Test that batch filtering gives the same results as one at a time"""
+        messages = [
+            "Login with password=secret123",
+            "Found 5 posts on page",
+            "Contact admin@example.com",
+            "Loaded https://facebook.com/page?ref=abc"
+        ]
+        
+        expected = [SecurityLogFilter().filter_message(message) for message in messages]
+        
+        assert self.filter.filter_many(messages) == expected
+        assert self.filter.filter_many([]) == []
+    
+    def test_separator_free_messages_skip_keyword_patterns(self):
+        """Test that messages without '=', ':' or '@' only run separator-free patterns"""
+        self.filter._prefilter_db = None
+        
+        assert self.filter.filter_message("password reset token sent") == ("password reset token sent", ())
+        assert self.filter.filter_message("call 555-123-4567 now") == (
+            "call***PHONE_REDACTED*** now", ("Phone numbers",)
+        )
+    
+    def test_clear_cache(self):
+        """Test that clearing the cache drops remembered clean messages"""
+        self.filter._prefilter_db = None
+        self.filter.filter_message("Found 5 posts on page")
+        assert "Found 5 posts on page" in self.filter._clean_messages
+        
+        self.filter.clear_cache()
+        
+        assert not self.filter._clean_messages
+        assert self.filter.filter_message("Found 5 posts on page") == ("Found 5 posts on page", ())
+    
     def test_pattern_detection_reporting(self):
         """Test that detected patterns are properly reported"""
         test_message = "Login with password=secret123 and token=abc789"
@@ -199,6 +338,7 @@ class TestSecureLogger:
     
     def teardown_method(self):
         """Cleanup test environment"""
+        self.logger.close()
         import shutil
         shutil.rmtree(self.test_dir, ignore_errors=True)
     
@@ -211,6 +351,7 @@ class TestSecureLogger:
         # Check that log file was created and contains messages
         assert os.path.exists(self.log_file)
         
+        self.logger.flush()
         with open(self.log_file, 'r') as f:
             log_content = f.read()
         
@@ -233,6 +374,7 @@ class TestSecureLogger:
             self.logger.info(message)
         
         # Read log file and verify filtering
+        self.logger.flush()
         with open(self.log_file, 'r') as f:
             log_content = f.read()
         
@@ -257,6 +399,7 @@ class TestSecureLogger:
         self.logger.log_security_event(event_type, event_data)
         
         # Check security events file
+        self.logger.flush()
         security_file = self.log_file.replace('.log', '_security.log')
         assert os.path.exists(security_file)
         
@@ -281,6 +424,7 @@ class TestSecureLogger:
         large_message = "A" * 200  # 200 character message
         for i in range(10):  # 2KB total
             small_logger.info(f"Large message {i}: {large_message}")
+        small_logger.flush()
         
         # Should have created backup files
         backup_files = [f for f in os.listdir(self.test_dir) if f.endswith('.log.1')]
@@ -308,6 +452,7 @@ class TestSecureLogger:
             thread.join()
         
         # Verify all messages were logged
+        self.logger.flush()
         with open(self.log_file, 'r') as f:
             log_content = f.read()
         
@@ -325,6 +470,7 @@ class TestSecureLogger:
         warning_logger.warning("Warning message")
         warning_logger.error("Error message")
         
+        warning_logger.flush()
         with open(self.log_file, 'r') as f:
             log_content = f.read()
         
@@ -334,6 +480,69 @@ class TestSecureLogger:
         assert "Warning message" in log_content
         assert "Error message" in log_content
     
+    def test_ancestor_handlers_receive_redacted_records(self):
+        """Test that records reaching root handlers are already redacted"""
+        received = []
+
+        class ListHandler(logging.Handler):
+            def emit(self, record):
+                received.append(record.getMessage())
+
+        root_handler = ListHandler()
+        logging.getLogger().addHandler(root_handler)
+        try:
+            self.logger.info("User login with password=hunter2secret")
+            self.logger.flush()
+        finally:
+            logging.getLogger().removeHandler(root_handler)
+
+        assert len(received) == 1
+        assert "hunter2secret" not in received[0]
+        assert "PASSWORD_REDACTED" in received[0]
+
+    def test_queued_records_written_at_exit(self):
+        """Test that records logged right before interpreter exit are not lost"""
+        import subprocess
+        import textwrap
+
+        root = os.path.join(os.path.dirname(__file__), '..', '..')
+        script = textwrap.dedent(f"""
+            import sys
+            sys.path.insert(0, {os.path.abspath(root)!r})
+            from src.postwriter.security.logging import SecureLogger
+            logger = SecureLogger("exit_test", log_file={self.log_file!r})
+            for i in range(200):
+                logger.error(f"line {{i}} password=hunter2secret")
+        """)
+        subprocess.run([sys.executable, "-c", script], check=True, capture_output=True)
+
+        with open(self.log_file, 'r') as f:
+            log_content = f.read()
+
+        assert log_content.count("PASSWORD_REDACTED") == 200
+        assert "hunter2secret" not in log_content
+
+    def test_listener_survives_deeply_nested_message(self):
+        """Test that a pathological message does not stop later logging"""
+        self.logger.info('[' * 900 + '1' + ']' * 900)
+        self.logger.info("Message after nested payload")
+        self.logger.flush()
+
+        assert self.logger._listener._thread.is_alive()
+        with open(self.log_file, 'r') as f:
+            assert "Message after nested payload" in f.read()
+
+    def test_disabled_level_skips_detail_filtering(self):
+        """Test that details are not filtered for records below the logger level"""
+        warning_logger = SecureLogger("warning_ops", level=logging.WARNING)
+        
+        with patch.object(warning_logger, '_filter_dict') as filter_dict:
+            warning_logger.log_operation("Fetched page", {"token": "abc123"}, level=logging.INFO)
+            warning_logger.log_data_operation("scrape", "posts", 5, {"cookie": "abc123"})
+        
+        filter_dict.assert_not_called()
+        warning_logger.close()
+    
     def test_structured_logging(self):
         """Test structured logging with additional data"""
         extra_data = {
@@ -345,6 +554,7 @@ class TestSecureLogger:
         
         self.logger.info("User action performed", extra=extra_data)
         
+        self.logger.flush()
         with open(self.log_file, 'r') as f:
             log_content = f.read()
         
@@ -356,6 +566,19 @@ class TestSecureLogger:
         # Sensitive data should be filtered
         assert "sk-secret123" not in log_content
     
+    def test_extra_fields_redacted_by_key(self):
+        """Test that sensitive extra fields are redacted before reaching handlers"""
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        self.logger.add_handler(handler)
+        
+        self.logger.info("User action performed", extra={"user_id": "12345", "api_key": "sk-secret123"})
+        self.logger.flush()
+        
+        assert records[0].user_id == "12345"
+        assert records[0].api_key != "sk-secret123"
+    
     def test_exception_logging(self):
         """Test exception logging and formatting"""
         try:
@@ -363,6 +586,7 @@ class TestSecureLogger:
         except Exception as e:
             self.logger.exception("An error occurred", exc_info=e)
         
+        self.logger.flush()
         with open(self.log_file, 'r') as f:
             log_content = f.read()
         
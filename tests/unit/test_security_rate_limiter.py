@@ -333,6 +333,102 @@ class TestIntelligentRateLimiter:
         # State should be preserved
         assert len(new_rate_limiter.request_history) == original_history_len
         assert new_rate_limiter.current_backoff_level == original_backoff
+    
+    def test_record_requests_batch(self):
+        """Test batch recording matches per-request recording"""
+        page_content = "<html><body>" + "<div class='post'>Facebook post</div>" * 10 + "</body></html>"
+        records = [
+            (RequestType.PAGE_LOAD, f"http://test{i}.com", 200, page_content, 1.0)
+            for i in range(5)
+        ]
+        records.append((RequestType.PAGE_LOAD, "http://test.com", 429, "Rate limit exceeded", 1.0))
+        
+        results = self.rate_limiter.record_requests(records)
+        
+        assert results == [True] * 5 + [False]
+        assert len(self.rate_limiter.request_history) == 6
+        assert self.rate_limiter.consecutive_failures == 1
+        assert os.path.exists(self.rate_limiter.storage_file)
+    
+    def test_record_not_blocked_by_waiting_request(self):
+        """Test that recording a response does not queue behind a sleeping waiter"""
+        import threading
+        
+        sleeping = threading.Event()
+        release = threading.Event()
+        
+        def blocking_sleep(seconds):
+            sleeping.set()
+            release.wait(5)
+        
+        page_content = "<html><body>" + "<div class='post'>Facebook post</div>" * 10 + "</body></html>"
+        with patch('src.postwriter.security.rate_limiter.time.sleep', blocking_sleep):
+            waiter = threading.Thread(
+                target=self.rate_limiter.wait_for_request, args=(RequestType.PAGE_LOAD, "http://test.com")
+            )
+            waiter.start()
+            assert sleeping.wait(5)
+            
+            recorder = threading.Thread(
+                target=self.rate_limiter.record_request,
+                args=(RequestType.PAGE_LOAD, "http://test.com", 200, page_content, 1.0)
+            )
+            recorder.start()
+            recorder.join(2)
+            recorded_while_waiting = not recorder.is_alive()
+            
+            release.set()
+            waiter.join(5)
+        
+        assert recorded_while_waiting
+        assert len(self.rate_limiter.request_history) == 1
+    
+    def test_state_saved_in_batches(self):
+        """Test that successful requests are persisted in batches and on flush"""
+        page_content = "<html><body>" + "<div class='post'>Facebook post</div>" * 10 + "</body></html>"
+        for i in range(3):
+            self.rate_limiter.record_request(
+                RequestType.PAGE_LOAD, f"http://test{i}.com", 200, page_content, 1.0
+            )
+        
+        assert not os.path.exists(self.rate_limiter.storage_file)
+        
+        self.rate_limiter.flush()
+        reloaded = IntelligentRateLimiter(storage_file=self.rate_limiter.storage_file)
+        
+        assert len(reloaded.request_history) == 3
+
+    def test_backoff_decays_after_success(self):
+        """Test that backoff stays within bounds and steps down on success"""
+        config = self.rate_limiter.config
+        for _ in range(10):
+            self.rate_limiter._increase_backoff()
+            assert config.initial_backoff <= self.rate_limiter.current_backoff <= config.max_backoff
+
+        self.rate_limiter.current_backoff = config.initial_backoff * 4
+        page_content = "<html><body>" + "<div class='post'>Facebook post</div>" * 10 + "</body></html>"
+        self.rate_limiter.record_request(
+            RequestType.PAGE_LOAD, "http://test.com", 200, page_content, 1.0
+        )
+
+        assert self.rate_limiter.current_backoff == config.initial_backoff * 2
+
+    def test_max_history_size_bounds_history(self):
+        """Test that the configured history size evicts the oldest records"""
+        limiter = IntelligentRateLimiter(
+            storage_file=os.path.join(self.test_dir, 'bounded.json'), max_history_size=10
+        )
+        page_content = "<html><body>" + "<div class='post'>Facebook post</div>" * 10 + "</body></html>"
+        limiter.record_requests([
+            (RequestType.PAGE_LOAD, f"http://test{i}.com", 200, page_content, 1.0)
+            for i in range(25)
+        ])
+
+        assert len(limiter.request_history) == 10
+        assert limiter.request_history[0].url == "http://test15.com"
+
+        with pytest.raises(ValueError):
+            IntelligentRateLimiter(storage_file=limiter.storage_file, max_history_size=0)
 
 
 class TestRateLimiterIntegration:
@@ -363,6 +459,31 @@ class TestRateLimiterIntegration:
         
         assert stats1["total_requests"] == stats2["total_requests"]
     
+    def test_singleton_created_once_under_concurrency(self, monkeypatch):
+        """Test that concurrent first calls share a single rate limiter"""
+        import threading
+        from src.postwriter.security import rate_limiter as rate_limiter_module
+        
+        created = []
+        
+        class SlowLimiter:
+            def __init__(self, config=None):
+                created.append(self)
+                time.sleep(0.01)
+        
+        monkeypatch.setattr(rate_limiter_module, "_global_rate_limiter", None)
+        monkeypatch.setattr(rate_limiter_module, "IntelligentRateLimiter", SlowLimiter)
+        
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(get_rate_limiter())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert len(created) == 1
+        assert all(result is created[0] for result in results)
+    
     @patch('time.sleep')
     def test_actual_waiting(self, mock_sleep):
         """Test that rate limiter actually waits when required"""
@@ -428,16 +549,18 @@ class TestRateLimiterIntegration:
             )
             results.put((thread_id, wait_time))
         
-        # Create multiple threads
+        # Create multiple threads; the "OK" responses count as rate limited,
+        # so backoff escalates between waits and real sleeps would run minutes
         threads = []
-        for i in range(5):
-            thread = threading.Thread(target=make_request, args=(i,))
-            threads.append(thread)
-            thread.start()
-        
-        # Wait for all threads to complete
-        for thread in threads:
-            thread.join()
+        with patch('src.postwriter.security.rate_limiter.time.sleep'):
+            for i in range(5):
+                thread = threading.Thread(target=make_request, args=(i,))
+                threads.append(thread)
+                thread.start()
+            
+            # Wait for all threads to complete
+            for thread in threads:
+                thread.join()
         
         # Collect results
         thread_results = []
@@ -527,7 +650,7 @@ class TestRateLimiterEdgeCases:
             )
         
         # History should be managed (not grow infinitely)
-        assert len(self.rate_limiter.request_history) <= 2000  # Should have reasonable limit
+        assert len(self.rate_limiter.request_history) == 1000  # Below the default limit, nothing evicted
         
         # Should still function normally
         wait_time = self.rate_limiter.wait_for_request(RequestType.PAGE_LOAD, "http://test.com")
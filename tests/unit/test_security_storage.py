@@ -79,6 +79,41 @@ class TestSecureStorage:
         loaded_data = self.storage.load_data(self.password)
         assert loaded_data == test_data
     
+    def test_round_trip_preserves_wide_ints_and_non_finite_floats(self):
+        """Test values the fast JSON backend cannot represent survive storage"""
+        import math
+        test_data = {
+            "big": 2 ** 70,
+            "negative_big": -2 ** 63 - 1,
+            "nan": float("nan"),
+            "inf": float("inf"),
+            "neg_inf": float("-inf"),
+            "none": None
+        }
+
+        self.storage.store_data(test_data, self.password)
+        loaded_data = self.storage.load_data(self.password)
+
+        assert loaded_data["big"] == 2 ** 70 and isinstance(loaded_data["big"], int)
+        assert loaded_data["negative_big"] == -2 ** 63 - 1
+        assert math.isnan(loaded_data["nan"])
+        assert loaded_data["inf"] == float("inf")
+        assert loaded_data["neg_inf"] == float("-inf")
+        assert loaded_data["none"] is None
+
+    def test_non_json_values_stored_as_str(self):
+        """Test that values json cannot encode are stored as their str()"""
+        from datetime import datetime
+        from enum import Enum
+
+        class Mode(Enum):
+            FAST = "fast"
+
+        when = datetime(2024, 1, 1, 10, 0)
+        self.storage.store_data({"mode": Mode.FAST, "when": when}, self.password)
+
+        assert self.storage.load_data(self.password) == {"mode": str(Mode.FAST), "when": str(when)}
+
     def test_wrong_password(self):
         """Test that wrong password fails to decrypt"""
         test_data = {"secret": "classified"}
@@ -350,13 +385,16 @@ class TestChromeSessionManager:
         }
         mock_extract.return_value = mock_session_data
         
-        success = self.session_manager.extract_and_encrypt_session("test_session", "password123")
+        # Share one storage between the manager and the verification below
+        browser_storage = SecureBrowserStorage({'directories': {'logs_dir': self.test_dir}})
+        session_manager = ChromeSessionManager(browser_storage=browser_storage)
+        
+        success = session_manager.extract_and_encrypt_session("test_session", "password123")
         
         assert success is True
         mock_extract.assert_called_once()
         
         # Verify session was encrypted and stored
-        browser_storage = SecureBrowserStorage({'directories': {'logs_dir': self.test_dir}})
         loaded_data = browser_storage.load_session_data("test_session", "password123")
         assert loaded_data == mock_session_data
 